@@ -2,110 +2,350 @@ import re
 from tabnanny import check
 import time
 import json
+import random
 import asyncio
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+import secrets
+import functools
+from types import SimpleNamespace
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple, Callable, Awaitable, AsyncIterable, AsyncIterator, Union
+from dataclasses import dataclass, field
 from datetime import date, datetime
+from email.utils import parsedate_to_datetime
 import httpx
+import orjson
+from cachetools import LRUCache
 
 
-@dataclass
+# API端点路径, 相对于base_url
+ENDPOINTS = SimpleNamespace(
+    access_token_v1="api/v1/access_token",
+    user_info_v1="api/v1/user/info",
+    file_detail_v1="api/v1/file/detail",
+    file_infos_v1="api/v1/file/infos",
+    file_move_v1="api/v1/file/move",
+    file_name_v1="api/v1/file/name",
+    file_rename_v1="api/v1/file/rename",
+    file_trash_v1="api/v1/file/trash",
+    file_recover_v1="api/v1/file/recover",
+    file_delete_v1="api/v1/file/delete",
+    file_list_v1="api/v1/file/list",
+    file_list_v2="api/v2/file/list",
+    upload_file_mkdir_v1="upload/v1/file/mkdir",
+    upload_file_create_v1="upload/v1/file/create",
+    upload_file_get_upload_url_v1="upload/v1/file/get_upload_url",
+    upload_file_list_upload_parts_v1="upload/v1/file/list_upload_parts",
+    upload_file_upload_complete_v1="upload/v1/file/upload_complete",
+    upload_file_upload_async_result_v1="upload/v1/file/upload_async_result",
+    upload_file_create_v2="upload/v2/file/create",
+    upload_file_slice_v2="upload/v2/file/slice",
+    upload_file_complete_v2="upload/v2/file/complete",
+    upload_file_domain_v2="upload/v2/file/domain",
+    upload_file_single_create_v2="upload/v2/file/single/create",
+    file_download_info_v1="api/v1/file/download_info",
+    offline_download_v1="api/v1/offline/download",
+    offline_download_progress_v1="api/v1/offline/download/progress",
+    share_content_payment_create_v1="api/v1/share/content-payment/create",
+    share_create_v1="api/v1/share/create",
+    share_list_info_v1="api/v1/share/list/info",
+    share_list_v1="api/v1/share/list",
+    transcode_folder_info_v1="api/v1/transcode/folder/info",
+    transcode_upload_from_cloud_disk_v1="api/v1/transcode/upload/from_cloud_disk",
+    transcode_delete_v1="api/v1/transcode/delete",
+    transcode_video_resolutions_v1="api/v1/transcode/video/resolutions",
+    transcode_video_v1="api/v1/transcode/video",
+    transcode_video_record_v1="api/v1/transcode/video/record",
+    transcode_video_result_v1="api/v1/transcode/video/result",
+    transcode_file_download_v1="api/v1/transcode/file/download",
+    transcode_m3u8_ts_download_v1="api/v1/transcode/m3u8_ts/download",
+    transcode_file_download_all_v1="api/v1/transcode/file/download/all",
+)
+
+
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+RETRYABLE_POST_STATUS = frozenset({429, 503})  # POST非幂等, 仅重试服务端明确未处理的请求
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_CAP = 30.0
+RETRY_JITTER = 0.25
+TOKEN_FILE = "access_token.json"
+TOKEN_EXPIRY_MARGIN = 60  # 令牌提前60秒视为过期
+
+
+def _read_token_file() -> Dict[str, Any]:
+    """读取本地令牌文件"""
+    try:
+        with open(TOKEN_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_token_file(access_token: str, expires_at: float) -> None:
+    """写入本地令牌文件"""
+    with open(TOKEN_FILE, "w") as f:
+        json.dump({"accessToken": access_token, "expiredAt": expires_at}, f)
+
+
+def _parse_retry_after(headers: httpx.Headers) -> Optional[float]:
+    """解析Retry-After响应头(秒数或HTTP日期), 无法解析时返回None"""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+FileContent = Union[bytes, AsyncIterable[bytes], Path]
+
+
+async def _aiter_file(path: Path, chunk_size: int = 1 << 16) -> AsyncIterator[bytes]:
+    """在线程池中分块读取文件"""
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        while chunk := await asyncio.to_thread(f.read, chunk_size):
+            yield chunk
+    finally:
+        f.close()
+
+
+# 与httpx一致的表单参数转义: 引号、反斜杠及控制字符(ESC除外)
+_FORM_PARAM_REPLACEMENTS = {'"': "%22", "\\": "\\\\"}
+_FORM_PARAM_REPLACEMENTS.update({chr(c): "%{:02X}".format(c) for c in range(0x1F + 1) if c != 0x1B})
+_FORM_PARAM_RE = re.compile("|".join(re.escape(c) for c in _FORM_PARAM_REPLACEMENTS))
+
+
+def _escape_form_param(value: str) -> str:
+    """转义Content-Disposition中的name/filename参数值"""
+    return _FORM_PARAM_RE.sub(lambda m: _FORM_PARAM_REPLACEMENTS[m.group(0)], value)
+
+
+def _form_value(value: Any) -> str:
+    """表单字段值转字符串, 与httpx保持一致"""
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    return str(value)
+
+
+def _multipart_stream(fields: Dict[str, Any], file_field: str, filename: str, file: Union[AsyncIterable[bytes], Path], size: Optional[int] = None) -> Tuple[str, Optional[int], AsyncIterator[bytes]]:
+    """构造流式multipart/form-data请求体, 返回 (Content-Type, Content-Length, 请求体迭代器)"""
+    boundary = secrets.token_hex(16)
+    head = b"".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{_escape_form_param(name)}"\r\n\r\n{_form_value(value)}\r\n'.encode()
+        for name, value in fields.items()
+    )
+    head += (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{_escape_form_param(file_field)}"; filename="{_escape_form_param(filename)}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    if isinstance(file, Path):
+        size = file.stat().st_size
+        chunks = _aiter_file(file)
+    else:
+        chunks = file
+    
+    async def stream() -> AsyncIterator[bytes]:
+        yield head
+        async for chunk in chunks:
+            yield chunk
+        yield tail
+    
+    length = None if size is None else len(head) + size + len(tail)
+    return f"multipart/form-data; boundary={boundary}", length, stream()
+
+
+@dataclass(slots=True)
 class RateLimit:
-    """速率限制配置"""
+    """速率限制配置 (令牌桶)"""
     endpoint: str
-    max_requests_per_second: int
-    last_request_time: float = 0.0
-    request_count: int = 0
+    rate: float
+    capacity: float = 0.0
+    tokens: float = 0.0
+    last_refill: float = 0.0  # 事件循环单调时钟(loop.time()), 不受系统时间调整影响
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+    def __post_init__(self):
+        if not self.capacity:
+            self.capacity = float(self.rate)
+        self.tokens = self.capacity
 
 
 class API:
     """123Driver API Moudle"""
     
-    def __init__(self, client_id: str, client_secret: str, base_url: str = "https://open-api.123pan.com"):
+    # 各端点每秒请求数限制
+    _RATE_LIMITS: Dict[str, int] = {
+        "api/v1/access_token": 1,
+        "api/v1/user/info": 1,
+        "api/v1/file/move": 1,
+        "api/v1/file/delete": 1,
+        "api/v1/file/list": 4,
+        "api/v2/file/list": 3,
+        "upload/v1/file/mkdir": 2,
+        "upload/v1/file/create": 2,
+        "upload/v1/file/upload_async_result": 1,
+        "api/v1/share/list": 10,
+        "api/v1/share/list/info": 10,
+        "api/v1/transcode/folder/info": 20,
+        "api/v1/transcode/upload/from_cloud_disk": 1,
+        "api/v1/transcode/delete": 10,
+        "api/v1/transcode/video/resolutions": 1,
+        "api/v1/transcode/video": 3,
+        "api/v1/transcode/video/record": 20,
+        "api/v1/transcode/video/result": 20,
+        "api/v1/transcode/file/download": 10,
+        "api/v1/transcode/m3u8_ts/download": 20,
+        "api/v1/transcode/file/download/all": 1
+    }
+    
+    def __init__(self, client_id: str, client_secret: str, base_url: str = "https://open-api.123pan.com", max_retries: int = 5):
         self.client_id = client_id
         self.client_secret = client_secret
         self.base_url = base_url.rstrip('/')
+        self.max_retries = max(1, max_retries)
         self.access_token: str = ''
         self.token_expires_at: float = 0.0
-        
-        # 初始化速率限制配置
-        self.rate_limits = {
-            "api/v1/access_token": RateLimit("api/v1/access_token", 1),
-            "api/v1/user/info": RateLimit("api/v1/user/info", 1),
-            "api/v1/file/move": RateLimit("api/v1/file/move", 1),
-            "api/v1/file/delete": RateLimit("api/v1/file/delete", 1),
-            "api/v1/file/list": RateLimit("api/v1/file/list", 4),
-            "api/v2/file/list": RateLimit("api/v2/file/list", 3),
-            "upload/v1/file/mkdir": RateLimit("upload/v1/file/mkdir", 2),
-            "upload/v1/file/create": RateLimit("upload/v1/file/create", 2),
-            "upload/v1/file/upload_async_result": RateLimit("upload/v1/file/upload_async_result", 1),
-            "api/v1/share/list": RateLimit("api/v1/share/list", 10),
-            "api/v1/share/list/info": RateLimit("api/v1/share/list/info", 10),
-            "api/v1/transcode/folder/info": RateLimit("api/v1/transcode/folder/info", 20),
-            "api/v1/transcode/upload/from_cloud_disk": RateLimit("api/v1/transcode/upload/from_cloud_disk", 1),
-            "api/v1/transcode/delete": RateLimit("api/v1/transcode/delete", 10),
-            "api/v1/transcode/video/resolutions": RateLimit("api/v1/transcode/video/resolutions", 1),
-            "api/v1/transcode/video": RateLimit("api/v1/transcode/video", 3),
-            "api/v1/transcode/video/record": RateLimit("api/v1/transcode/video/record", 20),
-            "api/v1/transcode/video/result": RateLimit("api/v1/transcode/video/result", 20),
-            "api/v1/transcode/file/download": RateLimit("api/v1/transcode/file/download", 10),
-            "api/v1/transcode/m3u8_ts/download": RateLimit("api/v1/transcode/m3u8_ts/download", 20),
-            "api/v1/transcode/file/download/all": RateLimit("api/v1/transcode/file/download/all", 1)
+        self._base_headers: Dict[str, str] = {
+            "Content-Type": "application/json",
+            "Platform": "open_platform"
         }
+        self._headers: Dict[str, str] = self._base_headers
+        self._inflight: Dict[Tuple[Any, ...], asyncio.Future] = {}  # 进行中的GET请求
+        self.response_cache: LRUCache = LRUCache(maxsize=256)  # (endpoint, params) -> (etag, body, expiry)
         
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.rate_limits: Dict[str, RateLimit] = {}  # 按需创建的令牌桶
+        
+        # 复用长连接并启用HTTP/2，避免每次请求重新握手
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=True,
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=8, keepalive_expiry=75.0),
+            timeout=httpx.Timeout(30.0, connect=5.0),
+        )
+        # 预绑定各请求方法，省去每次请求按method字符串分发
+        self._get = self.client.get
+        self._post = self.client.post
+        self._put = self.client.put
+        self._senders = {"GET": self._get, "POST": self._post, "PUT": self._put}
     
     async def _enforce_rate_limit(self, endpoint: str):
         """强制执行速率限制"""
-        if endpoint not in self.rate_limits:
+        if endpoint not in self._RATE_LIMITS:
             return
         
-        rate_limit = self.rate_limits[endpoint]
-        current_time = time.time()
-        
-        # 如果距离上次请求不足1秒，需要等待
-        if current_time - rate_limit.last_request_time < 1.0:
-            wait_time = 1.0 - (current_time - rate_limit.last_request_time)
-            await asyncio.sleep(wait_time)
-        
-        # 检查是否超过每秒请求限制
-        if rate_limit.request_count >= rate_limit.max_requests_per_second:
-            # 等待到下一秒
-            await asyncio.sleep(1.0)
-            rate_limit.request_count = 0
-        
-        rate_limit.last_request_time = time.time()
-        rate_limit.request_count += 1
-    
-    async def _get_headers(self) -> Dict[str, str]:
-        """获取请求头"""
-        headers = {
-            "Content-Type": "application/json",
-            'Platform': 'open_platform'
-        }
-        
+        rate_limit = self.rate_limits.get(endpoint) or self.rate_limits.setdefault(endpoint, RateLimit(endpoint, self._RATE_LIMITS[endpoint]))
+        loop = asyncio.get_running_loop()
+        async with rate_limit.lock:
+            now = loop.time()
+            if not rate_limit.last_refill:
+                rate_limit.last_refill = now
+            
+            # 按时间补充令牌，不超过桶容量
+            elapsed = now - rate_limit.last_refill
+            rate_limit.tokens = min(rate_limit.capacity, rate_limit.tokens + elapsed * rate_limit.rate)
+            rate_limit.last_refill = now
+            
+            # 令牌不足时等待补足一个令牌
+            if rate_limit.tokens < 1:
+                await asyncio.sleep((1 - rate_limit.tokens) / rate_limit.rate)
+                rate_limit.tokens = 0.0
+                rate_limit.last_refill = loop.time()
+            else:
+                rate_limit.tokens -= 1
+    
+    def _update_headers(self) -> None:
+        """令牌变化时重建请求头"""
         if self.access_token:
-            headers["Authorization"] = f"Bearer {self.access_token}"
+            self._headers = {**self._base_headers, "Authorization": f"Bearer {self.access_token}"}
+        else:
+            self._headers = self._base_headers
+    
+    async def _send(self, send: Callable[..., Awaitable[httpx.Response]], endpoint: str, headers: Optional[dict] = None, json: Any = None, **kwargs) -> httpx.Response:
+        """通过预绑定的client方法(self._get/self._post/...)发送HTTP请求, 返回原始响应
         
-        return headers
+        遇到429/5xx时按Retry-After或指数退避+抖动重试, 最多max_retries次; POST仅重试429/503
+        """
+        if json is not None:
+            # 使用orjson序列化请求体
+            kwargs['content'] = orjson.dumps(json)
+        headers = headers or self._headers
+        # 流式请求体只能发送一次, 不做重试
+        max_retries = 1 if isinstance(kwargs.get('content'), AsyncIterable) else self.max_retries
+        retryable = RETRYABLE_POST_STATUS if send is self._post else RETRYABLE_STATUS
+        for attempt in range(max_retries):
+            await self._enforce_rate_limit(endpoint)
+            response = await send(endpoint, headers=headers, **kwargs)
+            if response.status_code not in retryable or attempt == max_retries - 1:
+                return response
+            delay = _parse_retry_after(response.headers)
+            if delay is None:
+                delay = min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * 2 ** attempt) + random.uniform(0, RETRY_JITTER)
+            await asyncio.sleep(delay)
+        return response
     
-    async def _make_request(self, method: str, endpoint: str,headers: dict = {}, **kwargs) -> Dict[str, Any]:
+    async def _request_json(self, send: Callable[..., Awaitable[httpx.Response]], endpoint: str, headers: Optional[dict] = None, json: Any = None, **kwargs) -> Dict[str, Any]:
+        """发送HTTP请求并解析json响应, 相同的GET请求进行中时复用其结果"""
+        if send is self._get:
+            key = (endpoint, tuple(sorted((kwargs.get('params') or {}).items())))
+            return await self._coalesce(key, lambda: self._fetch_json(send, endpoint, headers=headers, json=json, **kwargs))
+        return await self._fetch_json(send, endpoint, headers=headers, json=json, **kwargs)
+    
+    async def _fetch_json(self, send: Callable[..., Awaitable[httpx.Response]], endpoint: str, headers: Optional[dict] = None, json: Any = None, **kwargs) -> Dict[str, Any]:
+        """发送HTTP请求并解析json响应"""
+        response = await self._send(send, endpoint, headers=headers, json=json, **kwargs)
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
+    async def _coalesce(self, key: Tuple[Any, ...], request: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """合并进行中的相同请求: 已有相同key的请求时等待其结果, 否则发起请求"""
+        task = self._inflight.get(key)
+        if task is None:
+            # 请求在独立任务中执行, 发起者被取消时不影响其他等待者
+            task = asyncio.ensure_future(request())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())  # 标记异常已读取, 无等待者时不告警
+        return await asyncio.shield(task)
+    
+    async def _make_request(self, method: str, endpoint: str, headers: Optional[dict] = None, json: Any = None, **kwargs) -> Dict[str, Any]:
         """发送HTTP请求"""
-        await self._enforce_rate_limit(endpoint)
-        
-        url = f"{self.base_url}/{endpoint}"
-        if not headers:
-            headers = await self._get_headers()
-        
-        response = await self.client.request(
-            method=method,
-            url=url,
-            headers=headers,
-            **kwargs
-        )
+        send = self._senders.get(method) or functools.partial(self.client.request, method)
+        return await self._request_json(send, endpoint, headers=headers, json=json, **kwargs)
+    
+    async def _cached_get(self, endpoint: str, params: Optional[Dict[str, Any]] = None, ttl: float = 0.0) -> Dict[str, Any]:
+        """带ETag协商缓存的GET请求, ttl内直接返回缓存, 过期后携带If-None-Match重新验证"""
+        key = (endpoint, tuple(sorted((params or {}).items())))
+        entry = self.response_cache.get(key)
+        if entry and entry[2] > time.monotonic():
+            return entry[1]
+        return await self._coalesce(key, lambda: self._revalidate(key, endpoint, params, ttl))
+    
+    async def _revalidate(self, key: Tuple[Any, ...], endpoint: str, params: Optional[Dict[str, Any]], ttl: float) -> Dict[str, Any]:
+        """携带If-None-Match请求, 304时复用缓存内容"""
+        entry = self.response_cache.get(key)
+        headers = self._headers
+        if entry and entry[0]:
+            headers = {**headers, "If-None-Match": entry[0]}
+        response = await self._send(self._get, endpoint, headers=headers, params=params)
+        now = time.monotonic()
+        if entry and response.status_code == 304:
+            self.response_cache[key] = (entry[0], entry[1], now + ttl)
+            return entry[1]
         
         response.raise_for_status()
-        return response.json()
+        body = orjson.loads(response.content)
+        etag = response.headers.get("etag")
+        if etag or ttl:
+            self.response_cache[key] = (etag, body, now + ttl)
+        return body
     
     async def get_access_token(self) -> Dict[str, Any]:
         """获取访问令牌"""
@@ -114,48 +354,50 @@ class API:
             "clientSecret": self.client_secret
         }
         
-        response = await self._make_request("POST", "api/v1/access_token", json=data)
+        response = await self._request_json(self._post, ENDPOINTS.access_token_v1, json=data)
         if not response['code']:
             self.access_token = response['data']["access_token"]
+            self._update_headers()
             self.token_expires_at = datetime.fromisoformat(response['data']["expiredAt"]).timestamp()
             await self.save_access_token()
         return response
     
     async def save_access_token(self) -> None:
         """保存访问令牌"""
-        with open("access_token.json", "w") as f:
-            json.dump({"acceseToken": self.access_token, "expiredAt": self.token_expires_at}, f)
+        await asyncio.to_thread(_write_token_file, self.access_token, self.token_expires_at)
     
     def check_access_token(self) -> bool:
         """检查访问令牌是否有效"""
-        try:
-            with open("access_token.json", "r") as f:
-                data = json.load(f)
-            self.access_token = data["accessToken"]
-            self.token_expires_at = data["expiredAt"]
-            if self.token_expires_at < datetime.now().timestamp():
+        if not self.access_token:
+            # 内存中没有令牌时才读取本地文件
+            data = _read_token_file()
+            if not data:
                 return False
-            return True
-        except FileNotFoundError:
-            return False
+            # 兼容旧版本写入的错误键名"acceseToken"
+            self.access_token = data.get("accessToken") or data.get("acceseToken", "")
+            self.token_expires_at = data.get("expiredAt", 0.0)
+            self._update_headers()
+        return self.token_expires_at - TOKEN_EXPIRY_MARGIN > time.time()
         
     async def refresh_access_token(self) -> None:
         """刷新访问令牌"""
-        if not self.check_access_token():
+        if not self.token_expires_at: # 尚未加载过令牌时才读取本地文件
+            self.check_access_token()
+        if self.token_expires_at - TOKEN_EXPIRY_MARGIN <= time.time():
             await self.get_access_token()
     
     async def get_user_info(self) -> Dict[str, Any]:
         """获取用户信息"""
-        return await self._make_request("GET", "api/v1/user/info")
+        return await self._cached_get(ENDPOINTS.user_info_v1, ttl=30.0)
     
     async def get_file_info(self, fileId: int) -> Dict[str, Any]:
         """获取单个文件信息"""
-        return await self._make_request("GET", f"api/v1/file/detail?fileId={fileId}")
+        return await self._request_json(self._get, ENDPOINTS.file_detail_v1, params={"fileId": fileId})
     
     async def fet_files_info(self, fileIds: List[int]) -> Dict[str, Any]:
         """获取多个文件信息"""
         data = {"fileIDs": fileIds}
-        return await self._make_request("POST", "api/v1/file/infos", json=data)
+        return await self._request_json(self._post, ENDPOINTS.file_infos_v1, json=data)
     
     async def move_file(self, fileIDs: List[int], toParentFileID: int) -> Dict[str, Any]:
         """移动文件"""
@@ -163,7 +405,7 @@ class API:
             "fileIDs": fileIDs,
             "toParentFileID": toParentFileID
         }
-        return await self._make_request("POST", "api/v1/file/move", json=data)
+        return await self._request_json(self._post, ENDPOINTS.file_move_v1, json=data)
     
     async def rename_single_file(self, fileId: int, fileName: str) -> Dict[str, Any]:
         """单个文件重命名"""
@@ -171,57 +413,50 @@ class API:
             "fileID": fileId,
             "fileName": fileName
         }
-        return await self._make_request("PUT", "api/v1/file/name", json=data)
+        return await self._request_json(self._put, ENDPOINTS.file_name_v1, json=data)
     
     async def rename_files(self, renameList: List[str]) -> Dict[str, Any]:
         """批量文件重命名"""
         data = {"renameList": renameList}
-        return await self._make_request("POST", "api/v1/file/rename", json=data)
+        return await self._request_json(self._post, ENDPOINTS.file_rename_v1, json=data)
+    
+    async def _batched_post(self, endpoint: str, ids: List[int], batch_size: int = 100, concurrency: int = 4) -> Dict[Any, Any]:
+        """分批并发提交fileIDs, 返回 {批次序号: 响应}"""
+        if endpoint in self._RATE_LIMITS:
+            concurrency = self._RATE_LIMITS[endpoint]
+        sem = asyncio.Semaphore(concurrency)
+        
+        async def post(batch: List[int]) -> Dict[str, Any]:
+            async with sem:
+                return await self._request_json(self._post, endpoint, json={"fileIDs": batch})
+        
+        batches = [ids[i:i+batch_size] for i in range(0, len(ids), batch_size)]
+        results = await asyncio.gather(*[post(batch) for batch in batches])
+        return {i: result for i, result in enumerate(results)}
     
     async def file_trash(self, fileIDs: List[int]) -> Dict[Any, Any]:
         """文件移入回收站"""
-        results = []
         batch_size = 100
         if len(fileIDs) > batch_size:
-            for i in range(0, len(fileIDs), batch_size):
-                batch = fileIDs[i:i+batch_size]
-                data = {"fileIDs": batch}
-                result = await self._make_request("POST", "api/v1/file/trash", json=data)
-                results.append(result)
-            return {i: result for i, result in enumerate(results)}
-        else:
-            data = {"fileIDs": fileIDs}
-        return await self._make_request("POST", "api/v1/file/trash", json=data)
+            return await self._batched_post(ENDPOINTS.file_trash_v1, fileIDs, batch_size=batch_size)
+        data = {"fileIDs": fileIDs}
+        return await self._request_json(self._post, ENDPOINTS.file_trash_v1, json=data)
     
     async def recover_file(self, fileIDs: List[int]) -> Dict[Any, Any]:
         """从回收站恢复文件"""
-        results = []
         batch_size = 100
         if len(fileIDs) > batch_size:
-            for i in range(0, len(fileIDs), batch_size):
-                batch = fileIDs[i:i+batch_size]
-                data = {"fileIDs": batch}
-                result = await self._make_request("POST", "api/v1/file/recover", json=data)
-                results.append(result)
-            return {i: result for i, result in enumerate(results)}
-        else:
-            data = {"fileIDs": fileIDs}
-            return await self._make_request("POST", "api/v1/file/recover", json=data)
+            return await self._batched_post(ENDPOINTS.file_recover_v1, fileIDs, batch_size=batch_size)
+        data = {"fileIDs": fileIDs}
+        return await self._request_json(self._post, ENDPOINTS.file_recover_v1, json=data)
     
     async def delete_file(self, fileIDs: List[int]) -> Dict[Any, Any]:
         """彻底删除文件"""
-        results = []
         batch_size = 100
         if len(fileIDs) > batch_size:
-            for i in range(0, len(fileIDs), batch_size):
-                batch = fileIDs[i:i+batch_size]
-                data = {"fileIDs": batch}
-                result = await self._make_request("POST", "api/v1/file/delete", json=data)
-                results.append(result)
-            return {i: result for i, result in enumerate(results)}
-        else:
-            data = {"fileIDs": fileIDs}
-            return await self._make_request("POST", "api/v1/file/delete", json=data)
+            return await self._batched_post(ENDPOINTS.file_delete_v1, fileIDs, batch_size=batch_size)
+        data = {"fileIDs": fileIDs}
+        return await self._request_json(self._post, ENDPOINTS.file_delete_v1, json=data)
     
     async def list_files_v1(self, parentFileId: int = 0, page: int = 1, limit: int = 100, orderBy: str = "file_name", orderDirection: str = "asc", trashed: bool = False, searchData: Optional[str] = None) -> Dict[str, Any]:
         """获取文件列表 (v1)"""
@@ -235,7 +470,7 @@ class API:
         }
         if searchData:
             params["searchData"] = searchData
-        return await self._make_request("GET", "api/v1/file/list", params=params)
+        return await self._cached_get(ENDPOINTS.file_list_v1, params=params)
     
     async def list_files_v2(self, parentFileId: int = 0, limit: int = 100, searchData: Optional[str] = None, searchMode: Optional[int] = None, lastFileId: Optional[int] = None) -> Dict[str, Any]:
         """获取文件列表 (v2)"""
@@ -249,12 +484,22 @@ class API:
             params["searchMode"] = searchMode
         if lastFileId is not None:
             params["lastFileId"] = lastFileId
-        return await self._make_request("GET", "api/v2/file/list", params=params)
+        return await self._cached_get(ENDPOINTS.file_list_v2, params=params)
+    
+    async def iter_files(self, parentFileId: int = 0, limit: int = 100, lastFileId: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """逐个返回目录下的文件, 按lastFileId自动翻页, 调用方可在找到目标后提前结束"""
+        while True:
+            files = await self.list_files_v2(parentFileId=parentFileId, limit=limit, lastFileId=lastFileId)
+            for f in files['data']['fileList']:
+                yield f
+            lastFileId = files['data']['lastFileId']
+            if lastFileId == -1:
+                return
     
     async def create_folder(self, name: str, parentID: int = 0) -> Dict[str, Any]:
         """创建文件夹"""
         data = {"name": name, "parentID": parentID}
-        return await self._make_request("POST", "upload/v1/file/mkdir", json=data)
+        return await self._request_json(self._post, ENDPOINTS.upload_file_mkdir_v1, json=data)
     
     async def create_file_v1(self, parentFileID: int, filename: str, etag: str, size: int, duplicate: int = 1, containDir: bool = False) -> Dict[str, Any]:
         """创建文件 (v1)"""
@@ -266,7 +511,7 @@ class API:
             "duplicate": duplicate,
             "containDir": containDir
         }
-        return await self._make_request("POST", "upload/v1/file/create", json=data)
+        return await self._request_json(self._post, ENDPOINTS.upload_file_create_v1, json=data)
     
     async def get_upload_url_v1(self, preuploadID: str, sliceNo: int) -> Dict[str, Any]:
         """获取上传URL (v1)"""
@@ -274,22 +519,22 @@ class API:
             "preuploadID": preuploadID,
             "sliceNo": sliceNo
         }
-        return await self._make_request("POST", "upload/v1/file/get_upload_url", json=data)
+        return await self._request_json(self._post, ENDPOINTS.upload_file_get_upload_url_v1, json=data)
     
     async def list_upload_parts_v1(self, preuploadID: str) -> Dict[str, Any]:
         """列举已上传分片 (v1)"""
         data = {"preuploadID": preuploadID}
-        return await self._make_request("POST", "upload/v1/file/list_upload_parts", json=data)
+        return await self._request_json(self._post, ENDPOINTS.upload_file_list_upload_parts_v1, json=data)
     
     async def upload_complete_v1(self, preuploadID: str) -> Dict[str, Any]:
         """完成上传 (v1)"""
         data = {"preuploadID": preuploadID}
-        return await self._make_request("POST", "upload/v1/file/upload_complete", json=data)
+        return await self._request_json(self._post, ENDPOINTS.upload_file_upload_complete_v1, json=data)
     
     async def upload_async_result_v1(self, preuploadID: str) -> Dict[str, Any]:
         """异步轮询获取上传结果(v1)"""
         data = {"preuploadID": preuploadID}
-        return await self._make_request("POST", "upload/v1/file/upload_async_result", json=data)
+        return await self._request_json(self._post, ENDPOINTS.upload_file_upload_async_result_v1, json=data)
     
     async def create_file_v2(self, parentFileID: int, filename: str, etag: str, size: int, duplicate: int = 1, containDir: bool = False) -> Dict[str, Any]:
         """创建文件 (v2)"""
@@ -301,30 +546,75 @@ class API:
             "duplicate": duplicate,
             "containDir": containDir
         }
-        return await self._make_request("POST", "upload/v2/file/create", json=data)
-    
-    async def upload_slice_v2(self, preuploadID: str, sliceNo: int, sliceMD5: str, slice: bytes) -> Dict[str, Any]:
+        return await self._request_json(self._post, ENDPOINTS.upload_file_create_v2, json=data)
+    
+    async def _upload_multipart(self, endpoint: str, fields: Dict[str, Any], file_field: str, filename: str, file: FileContent, size: Optional[int] = None) -> Dict[str, Any]:
+        """以multipart/form-data上传文件, Path/异步迭代器按块流式发送"""
+        if isinstance(file, (bytes, bytearray, memoryview)):
+            # multipart的Content-Type(含boundary)由httpx生成
+            headers = {k: v for k, v in self._headers.items() if k != "Content-Type"}
+            files = {file_field: (filename, file)}
+            return await self._request_json(self._post, endpoint, headers=headers, data=fields, files=files)
+        content_type, length, stream = _multipart_stream(fields, file_field, filename, file, size)
+        headers = {**self._headers, "Content-Type": content_type}
+        if length is not None:
+            headers["Content-Length"] = str(length)
+        return await self._request_json(self._post, endpoint, headers=headers, content=stream)
+    
+    async def upload_slice_v2(self, preuploadID: str, sliceNo: int, sliceMD5: str, slice: FileContent) -> Dict[str, Any]:
         """上传分片 (v2)"""
-        headers = await self._get_headers()
-        headers["Content-Type"] = "multipart/form-data"
         data = {
             "preuploadID": preuploadID,
             "sliceNo": sliceNo,
             "sliceMD5": sliceMD5,
-            "slice": slice
         }
-        return await self._make_request("POST", "upload/v2/file/slice", headers=headers, data=data)
+        return await self._upload_multipart(ENDPOINTS.upload_file_slice_v2, data, "slice", f"{preuploadID}_{sliceNo}", slice)
+    
+    async def upload_slices(self, preuploadID: str, slices: List[Tuple[int, str, FileContent]], workers: int = 4) -> List[Dict[str, Any]]:
+        """并发上传多个分片 (v2)
+        
+        Args:
+            preuploadID: 预上传ID
+            slices: 分片列表, 每项为 (sliceNo, sliceMD5, slice)
+            workers: 并发上传数, 配置了速率限制时取该端点每秒请求数
+            
+        Returns:
+            按sliceNo排序的分片上传响应列表
+        """
+        endpoint = ENDPOINTS.upload_file_slice_v2
+        if endpoint in self._RATE_LIMITS:
+            workers = self._RATE_LIMITS[endpoint]
+        workers = min(workers, len(slices))
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in slices:
+            queue.put_nowait(item)
+        for _ in range(workers):
+            queue.put_nowait(None)
+        results: Dict[int, Dict[str, Any]] = {}
+        
+        async def worker():
+            while (item := await queue.get()) is not None:
+                results[item[0]] = await self.upload_slice_v2(preuploadID, *item)
+        
+        tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return [results[sliceNo] for sliceNo in sorted(results)]
     
     async def upload_complete_v2(self, preuploadID: str) -> Dict[str, Any]:
         """上传完毕 (v2)"""
         data = {"preuploadID": preuploadID}
-        return await self._make_request("POST", "upload/v2/file/complete", json=data)
+        return await self._request_json(self._post, ENDPOINTS.upload_file_complete_v2, json=data)
     
     async def get_upload_domain_v2(self):
         """获取上传域名 (v2)"""
-        return await self._make_request("GET", "upload/v2/file/domain")
+        return await self._request_json(self._get, ENDPOINTS.upload_file_domain_v2)
     
-    async def single_upload_v2(self, parentFileID: int, filename: str, etag: str, size: int, file: bytes, duplicate: int = 1, containDir: bool = False) -> Dict[str, Any]:
+    async def single_upload_v2(self, parentFileID: int, filename: str, etag: str, size: int, file: FileContent, duplicate: int = 1, containDir: bool = False) -> Dict[str, Any]:
         """单步上传文件 (v2)"""
         data = {
             "parentFileID": parentFileID,
@@ -334,12 +624,12 @@ class API:
             "duplicate": duplicate,
             "containDir": containDir
         }
-        return await self._make_request("POST", "upload/v2/file/single/create", json=data, data=file)
+        return await self._upload_multipart(ENDPOINTS.upload_file_single_create_v2, data, "file", filename, file, size=size)
     
     async def download_file(self, fileId: int) -> Dict[str, Any]:
         """下载文件"""
         params = {"fileId": fileId}
-        return await self._make_request("GET", "api/v1/file/download_info", params=params)
+        return await self._request_json(self._get, ENDPOINTS.file_download_info_v1, params=params)
     
     async def create_offline_downlod(self, url: str,  dirID: int, fileName: Optional[str] = None, callBackUrl: Optional[str] = None) -> Dict[str, Any]:
         """创建离线下载任务"""
@@ -350,12 +640,12 @@ class API:
         }
         if callBackUrl is not None:
             data["callBackUrl"] = callBackUrl
-        return await self._make_request("POST", "/api/v1/offline/download", json=data)
+        return await self._request_json(self._post, ENDPOINTS.offline_download_v1, json=data)
     
     async def offline_progress(self, taskID: int) -> Dict[str, Any]:
         """离线下载进度"""
         params = {"taskID": taskID}
-        return await self._make_request("GET", "/api/v1/offline/download/progress", params=params)
+        return await self._request_json(self._get, ENDPOINTS.offline_download_progress_v1, params=params)
     
     async def share_payment_files(self, shareName: str, fileIDList: str, payAmount: int, resourceDesc: str, isReward: bool|int = False) -> Dict[str, Any]:
         """分享付费文件"""
@@ -366,7 +656,7 @@ class API:
             "resourceDesc": resourceDesc,
             "isReward": int(isReward)
         }
-        return await self._make_request("POST", "/api/v1/share/content-payment/create", json=data)
+        return await self._request_json(self._post, ENDPOINTS.share_content_payment_create_v1, json=data)
     
     async def create_share(self, shareName: str, shareExpire: int,  fileIDList: str, sharePwd: Optional[str] = None, trafficSwitch: Optional[int] = None, trafficLimitSwitch: Optional[int] = None, trafficLimit: Optional[int] = None) -> Dict[str, Any]:
         """创建分享"""
@@ -383,7 +673,7 @@ class API:
             data["trafficLimitSwitch"] = trafficLimitSwitch
         if trafficLimit is not None:
             data["trafficLimit"] = trafficLimit
-        return await self._make_request("POST", "api/v1/share/create", json=data)
+        return await self._request_json(self._post, ENDPOINTS.share_create_v1, json=data)
     
     async def edit_share(self, shareIdList: List[int], trafficSwitch: Optional[int] = None, trafficLimitSwitch: Optional[int] = None, trafficLimit: Optional[int] = None) -> Dict[str, Any]:
         """编辑分享"""
@@ -396,17 +686,17 @@ class API:
             data["trafficLimitSwitch"] = trafficLimitSwitch
         if trafficLimit is not None:
             data["trafficLimit"] = trafficLimit
-        return await self._make_request("PUT", "api/v1/share/list/info", json=data)
+        return await self._request_json(self._put, ENDPOINTS.share_list_info_v1, json=data)
 
     async def get_share_list(self, limit: int = 100, lastShareId: int = 0) -> Dict[str, Any]:
         """获取分享列表"""
         params = {"limit": limit, "lastShareId": lastShareId}
-        return await self._make_request("GET", "api/v1/share/list", params=params)
+        return await self._cached_get(ENDPOINTS.share_list_v1, params=params)
     
     async def get_transcode_folder_info(self, folder_path: str) -> Dict[str, Any]:
         """获取转码文件夹信息"""
         params = {"folder_path": folder_path}
-        return await self._make_request("GET", "api/v1/transcode/folder/info", params=params)
+        return await self._request_json(self._get, ENDPOINTS.transcode_folder_info_v1, params=params)
     
     async def upload_from_cloud_disk(self, source_path: str, target_path: str) -> Dict[str, Any]:
         """从云盘上传文件进行转码"""
@@ -414,16 +704,16 @@ class API:
             "source_path": source_path,
             "target_path": target_path
         }
-        return await self._make_request("POST", "api/v1/transcode/upload/from_cloud_disk", json=data)
+        return await self._request_json(self._post, ENDPOINTS.transcode_upload_from_cloud_disk_v1, json=data)
     
     async def delete_transcode(self, transcode_id: str) -> Dict[str, Any]:
         """删除转码任务"""
         data = {"transcode_id": transcode_id}
-        return await self._make_request("POST", "api/v1/transcode/delete", json=data)
+        return await self._request_json(self._post, ENDPOINTS.transcode_delete_v1, json=data)
     
     async def get_video_resolutions(self) -> Dict[str, Any]:
         """获取视频分辨率列表"""
-        return await self._make_request("GET", "api/v1/transcode/video/resolutions")
+        return await self._cached_get(ENDPOINTS.transcode_video_resolutions_v1, ttl=3600.0)
     
     async def transcode_video(self, file_path: str, resolution: str, output_format: str = "mp4") -> Dict[str, Any]:
         """转码视频"""
@@ -432,17 +722,17 @@ class API:
             "resolution": resolution,
             "output_format": output_format
         }
-        return await self._make_request("POST", "api/v1/transcode/video", json=data)
+        return await self._request_json(self._post, ENDPOINTS.transcode_video_v1, json=data)
     
     async def get_transcode_record(self, transcode_id: str) -> Dict[str, Any]:
         """获取转码记录"""
         params = {"transcode_id": transcode_id}
-        return await self._make_request("GET", "api/v1/transcode/video/record", params=params)
+        return await self._request_json(self._get, ENDPOINTS.transcode_video_record_v1, params=params)
     
     async def get_transcode_result(self, transcode_id: str) -> Dict[str, Any]:
         """获取转码结果"""
         params = {"transcode_id": transcode_id}
-        return await self._make_request("GET", "api/v1/transcode/video/result", params=params)
+        return await self._request_json(self._get, ENDPOINTS.transcode_video_result_v1, params=params)
     
     async def download_transcode_file(self, transcode_id: str, file_path: str) -> Dict[str, Any]:
         """下载转码文件"""
@@ -450,7 +740,7 @@ class API:
             "transcode_id": transcode_id,
             "file_path": file_path
         }
-        return await self._make_request("GET", "api/v1/transcode/file/download", params=params)
+        return await self._request_json(self._get, ENDPOINTS.transcode_file_download_v1, params=params)
     
     async def download_m3u8_ts(self, m3u8_url: str, ts_file: str) -> Dict[str, Any]:
         """下载M3U8 TS文件"""
@@ -458,12 +748,12 @@ class API:
             "m3u8_url": m3u8_url,
             "ts_file": ts_file
         }
-        return await self._make_request("GET", "api/v1/transcode/m3u8_ts/download", params=params)
+        return await self._request_json(self._get, ENDPOINTS.transcode_m3u8_ts_download_v1, params=params)
     
     async def download_all_transcode_files(self, transcode_id: str) -> Dict[str, Any]:
         """下载所有转码文件"""
         params = {"transcode_id": transcode_id}
-        return await self._make_request("GET", "api/v1/transcode/file/download/all", params=params)
+        return await self._request_json(self._get, ENDPOINTS.transcode_file_download_all_v1, params=params)
     
     async def close(self):
         """关闭客户端"""
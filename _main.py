@@ -1,10 +1,17 @@
 import re
 import os
-from typing import Dict, List, Optional, Any
+import asyncio
+from typing import Dict, List, Optional, Any, Callable, Awaitable
 
 from _api import API
 from _logger import logger
-from _utils import async_to_sync, Utils
+from _utils import async_to_sync, gather_tasks, Utils
+
+try: # 可选依赖: 安装uvloop后使用其事件循环
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
 
 
 class Driver:
@@ -13,17 +20,25 @@ class Driver:
         self.utils = Utils()
         self.api = API(client_id=client_id, client_secret=client_secret, base_url=base_url)
         self.api.check_access_token()
+        self._api_sem = asyncio.Semaphore(8)  # 所有API调用的总并发数
+        self._list_sem = asyncio.Semaphore(5)  # 目录分页并发请求数
+        self._revalidating: Dict[tuple, asyncio.Task] = {}  # 后台重新验证中的缓存页
         logger.info("Driver initialized.")
+    
+    async def _call_api(self, method: Callable[..., Awaitable[Dict[str, Any]]], *args, **kwargs) -> Dict[str, Any]:
+        """在总并发限制内调用API"""
+        async with self._api_sem:
+            return await method(*args, **kwargs)
         
     async def user_info(self):
         """获取用户信息"""
         logger.info("Calling user_info()")
-        user_info = await self.api.get_user_info()
+        user_info = await self._call_api(self.api.get_user_info)
         if user_info.get('code') == 0:
             logger.info("User info fetched successfully.")
         else:
             logger.error(f"Error: {user_info.get('message')}")
-        logger.debug(f"user_info result: {user_info}")
+        logger.debug("user_info result: {}", user_info)
         return user_info
     
     async def list_dir(
@@ -34,17 +49,37 @@ class Driver:
         return_parentFileId: bool = False,
     ):
         """获取目录下的文件列表"""
-        logger.info(f"Calling list_dir(dir={dir}, page={page}, limit={limit})")
+        logger.info("Calling list_dir(dir={}, page={}, limit={})", dir, page, limit)
         parentFileId = 0
-        dir_list = dir.split('/')
+        segments = [i for i in dir.split('/') if i]
+        if not segments: # 根目录无需解析路径，直接返回
+            files = await self._list_dir_fetch_or_cache(parentFileId=parentFileId, page=page, limit=limit)
+            if return_parentFileId:
+                return files['data']['fileList'], parentFileId
+            return files['data']['fileList']
+        
+        path = '/' + '/'.join(segments)
+        if path in self.utils.path_cache:
+            parentFileId = self.utils.path_cache[path]
+            logger.debug("Resolved {} from path cache: parentFileId={}", path, parentFileId)
+        else:
+            path = ''
+            for i in segments:
+                logger.debug("Processing dir segment: '{}' with parentFileId={}", i, parentFileId)
+                path += '/' + i
+                if path in self.utils.path_cache:
+                    parentFileId = self.utils.path_cache[path]
+                    continue
+                parentFileId = await self._list_dir_fetch_parentFileId(parentFileId, i)
+                logger.debug("Updated parentFileId: {}", parentFileId)
+                if not parentFileId: # 目录不存在, 停止解析且不写入路径缓存
+                    logger.error("Error: {} not found.", path)
+                    if return_parentFileId:
+                        return [], None
+                    return []
+                self.utils.path_cache[path] = parentFileId
         files = await self._list_dir_fetch_or_cache(parentFileId=parentFileId, page=page, limit=limit)
-        for i in dir_list:
-            logger.debug(f"Processing dir segment: '{i}' with parentFileId={parentFileId}")
-            if i:
-                parentFileId = await self._list_dir_fetch_parentFileId(parentFileId, files, i, limit)
-                logger.debug(f"Updated parentFileId: {parentFileId}")
-                files = await self._list_dir_fetch_or_cache(parentFileId=parentFileId, page=page, limit=limit)
-        logger.info(f"Returning file list for dir={dir}")
+        logger.info("Returning file list for dir={}", dir)
         if return_parentFileId:
             return files['data']['fileList'], parentFileId
         else:
@@ -58,90 +93,160 @@ class Driver:
         lastFileId: Optional[int] = None,
     ) -> Dict[str, Any]:
         """从缓存中获取目录下的文件列表，如果缓存中没有，则从API获取"""
-        files_list = []
         pages = self.utils.computing_page(page=page, limit=limit)
+        files_map: Dict[int, Dict[str, Any]] = {}
+        missing = []
         for p in pages:
-            logger.debug(f"_list_dir_fetch_or_cache(parentFileId={parentFileId}, page={p}.")
+            logger.debug("_list_dir_fetch_or_cache(parentFileId={}, page={}.", parentFileId, p)
             files = self.utils.get_cached_files(parentFileId=parentFileId, page=p)
-            if not files:
-                logger.debug(f"No cached files found for parentFileId={parentFileId}, fetching from API.")
-                files = await self.api.list_files_v2(parentFileId=parentFileId, limit=limit, lastFileId=lastFileId)
-                self.utils.cache_files(files=files, parentFileId=parentFileId, page=p)
-                return files
+            if files:
+                logger.debug("Cached files found for parentFileId={}, returning from cache.", parentFileId)
+                files_map[p] = files
+                if not self.utils.is_fresh(parentFileId=parentFileId, page=p):
+                    self._schedule_revalidate(parentFileId, p, lastFileId)
             else:
-                logger.debug(f"Cached files found for parentFileId={parentFileId}, returning from cache.")
-                files = self.utils.get_cached_files(parentFileId=parentFileId, page=p)
-            files_list.append(files)
-        return self.utils.merge_files(files_list)
+                missing.append(p)
+        
+        if missing:
+            logger.debug("No cached files found for parentFileId={}, pages={}, fetching from API.", parentFileId, missing)
+            # v2接口按lastFileId游标分页: 游标已知的缺页(首页或前一页已缓存)并发获取, 其余按顺序补齐
+            ready, pending = [], []
+            for p in missing:
+                cursor = self._list_dir_page_cursor(parentFileId, p, files_map, lastFileId)
+                if cursor is ...:
+                    pending.append(p)
+                elif cursor != -1:
+                    ready.append((p, cursor))
+            results = await self._list_dir_fetch_pages(parentFileId, [cursor for _, cursor in ready])
+            for (p, _), files in zip(ready, results):
+                self.utils.cache_files(files=files, parentFileId=parentFileId, page=p)
+                files_map[p] = files
+            for p in pending:
+                # 回溯到游标已知的最近一页, 再顺序向后补齐
+                start = p
+                while self._list_dir_page_cursor(parentFileId, start, files_map, lastFileId) is ...:
+                    start -= 1
+                for q in range(start, p + 1):
+                    cursor = self._list_dir_page_cursor(parentFileId, q, files_map, lastFileId)
+                    if cursor == -1:
+                        break
+                    if q not in files_map and not self.utils.get_cached_files(parentFileId=parentFileId, page=q):
+                        files = await self._call_api(self.api.list_files_v2, parentFileId=parentFileId, limit=self.utils.PAGE_SIZE, lastFileId=cursor)
+                        self.utils.cache_files(files=files, parentFileId=parentFileId, page=q)
+                        files_map[q] = files
+        
+        # 缓存按PAGE_SIZE分页, 从合并结果中截取第page页(每页limit条)对应的区间
+        files = self.utils.merge_files([files_map[p] for p in pages if p in files_map])
+        start = (page - 1) * limit - (pages[0] - 1) * self.utils.PAGE_SIZE
+        files['data']['fileList'] = files['data']['fileList'][start:start + limit]
+        return files
+    
+    async def _list_dir_fetch_pages(
+        self,
+        parentFileId: int,
+        cursors: List[Optional[int]],
+    ) -> List[Dict[str, Any]]:
+        """并发获取多页文件列表, 并发数由self._list_sem限制"""
+        async def fetch(cursor: Optional[int]) -> Dict[str, Any]:
+            async with self._list_sem:
+                return await self._call_api(self.api.list_files_v2, parentFileId=parentFileId, limit=self.utils.PAGE_SIZE, lastFileId=cursor)
+        
+        return await gather_tasks(fetch(cursor) for cursor in cursors)
+    
+    def _schedule_revalidate(
+        self,
+        parentFileId: int,
+        page: int,
+        lastFileId: Optional[int] = None,
+    ) -> None:
+        """缓存页过了新鲜期: 先返回缓存, 在后台重新验证(stale-while-revalidate)"""
+        key = (parentFileId, page)
+        if key in self._revalidating:
+            return
+        task = asyncio.create_task(self._revalidate(parentFileId, page, lastFileId))
+        self._revalidating[key] = task
+        task.add_done_callback(lambda _: self._revalidating.pop(key, None))
+    
+    async def _revalidate(
+        self,
+        parentFileId: int,
+        page: int,
+        lastFileId: Optional[int] = None,
+    ) -> None:
+        """重新获取缓存页, API层携带ETag, 未变化时服务端返回304"""
+        cursor = self._list_dir_page_cursor(parentFileId, page, {}, lastFileId)
+        if cursor is ... or cursor == -1:
+            return
+        try:
+            async with self._list_sem:
+                files = await self._call_api(self.api.list_files_v2, parentFileId=parentFileId, limit=self.utils.PAGE_SIZE, lastFileId=cursor)
+        except Exception as e:
+            logger.warning("Revalidate parentFileId={}, page={} failed: {}", parentFileId, page, e)
+            return
+        self.utils.cache_files(files=files, parentFileId=parentFileId, page=page)
+    
+    def _list_dir_page_cursor(
+        self,
+        parentFileId: int,
+        page: int,
+        files_map: Dict[int, Dict[str, Any]],
+        lastFileId: Optional[int] = None,
+    ) -> Any:
+        """获取第page页的lastFileId游标, 前一页未知时返回Ellipsis, 已无更多页时返回-1"""
+        if page == 1:
+            return lastFileId
+        prev = files_map.get(page - 1) or self.utils.get_cached_files(parentFileId=parentFileId, page=page - 1)
+        if not prev:
+            return ...
+        return prev['data']['lastFileId']
 
     async def _list_dir_fetch_parentFileId(
         self,
         parentFileId: int,
-        files: Dict[str, Any],
         filename: str,
-        limit: int = 100,
-        lastFileId: Optional[int] = None,
-    ) -> int:
-        logger.info(f"_list_dir_fetch_parentFileId(parentFileId={parentFileId}, filename={filename}, limit={limit}, lastFileId={lastFileId})")
-        if await self._list_dir_in_files(files, filename) and lastFileId != -1: # 文件名在文件列表中，直接返回parentFileId
-            logger.debug(f"Found {filename} in files, getting parentFileId.")
-            return await self._list_dir_get_parentFileId(files, filename)
-        elif lastFileId != -1: # 文件名不在文件列表中，但有lastFileId，继续搜索
-            logger.debug(f"Fetching more files for parentFileId={parentFileId} with lastFileId={lastFileId}")
-            files = await self.api.list_files_v2(parentFileId=parentFileId, limit=limit, lastFileId=lastFileId)
-            return await self._list_dir_fetch_parentFileId(parentFileId, files, filename, limit, files['data']['lastFileId'])
-        else: # 文件名不在文件列表中，且lastFileId等于-1，说明文件列表已经遍历完毕，没有找到返回0
-            if await self._list_dir_in_files(files, filename):
-                logger.debug(f"Found {filename} in files after lastFileId exhausted.")
-                return await self._list_dir_get_parentFileId(files, filename)
-            else:
-                logger.error(f"Error: {filename} not found in {files['data']['fileList']}")
-                return 0
-
-    async def _list_dir_get_parentFileId(
-       self,
-       files: Dict[str, Any],
-       filename: str,
     ) -> int:
-        """获取指定目录的parentFileId"""
-        logger.info(f"_list_dir_get_parentFileId(filename={filename})")
-        for f in files['data']['fileList']:
-            if f['type'] == 1 and f['filename'] == filename:
-                logger.debug(f"Found parentFileId: {f['fileId']} for filename: {filename}")
-                return f['fileId']
-        logger.warning(f"Directory {filename} not found in fileList.")
-        return 0
-            
-    async def _list_dir_in_files(
+        """逐页查找目录名对应的fileId, 没有找到返回0"""
+        logger.debug("_list_dir_fetch_parentFileId(parentFileId={}, filename={})", parentFileId, filename)
+        f = await self._list_dir_find(parentFileId=parentFileId, filename=filename, type=1)
+        if f:
+            logger.debug("Found parentFileId: {} for filename: {}", f['fileId'], filename)
+        return f.get('fileId', 0)
+    
+    async def _list_dir_find(
         self,
-        files: Dict[str, Any],
+        parentFileId: int,
         filename: str,
-    ) -> bool:
-        """判断目标文件是否在文件列表中"""
-        logger.info(f"_list_dir_in_files(filename={filename})")
-        for f in files['data']['fileList']:
-            if f['type'] == 1 and f['filename'] == filename:
-                logger.debug(f"Found directory {filename} in fileList.")
-                return True
-        logger.debug(f"Directory {filename} not found in fileList.")
-        return False
-
-    async def fetch_file(self, parentFileId: int, filename: str, lastFileId: Optional[int] = None, page: int = 1) -> Dict[str, Any]:
-        """获取文件信息"""
-        logger.info(f"Calling fetch_file(parentFileID={parentFileId}, filename={filename})")
-        files = self.utils.get_cached_files(parentFileId=parentFileId, page=page)
-        if not files:
-            files = await self.api.list_files_v2(parentFileId=parentFileId, limit=100, lastFileId=lastFileId)
-            self.utils.cache_files(files=files, parentFileId=parentFileId, page=page)
-        for f in files['data']['fileList']:
-            if f['type'] == 0 and f['filename'] == filename:    
-                logger.debug(f"Found file {filename} in fileList.")
+        type: int,
+        page: int = 1,
+        lastFileId: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """从第page页开始按lastFileId逐页查找文件, 优先使用缓存页的索引, 没有找到返回空字典"""
+        while True:
+            files = self.utils.get_cached_files(parentFileId=parentFileId, page=page)
+            if files:
+                f = self.utils.lookup_cached(parentFileId=parentFileId, page=page, filename=filename, type=type)
+            else:
+                files = await self._call_api(self.api.list_files_v2, parentFileId=parentFileId, limit=self.utils.PAGE_SIZE, lastFileId=lastFileId)
+                f = self.utils.cache_files(files=files, parentFileId=parentFileId, page=page).get((type, filename))
+            if f: # 文件名在文件列表中，直接返回
                 return f
-        if lastFileId != -1: # 文件名不在文件列表中，但有lastFileId，继续搜索
-            logger.debug(f"Fetching more files for parentFileId={parentFileId} with lastFileId={lastFileId}")
-            await self.fetch_file(parentFileId=parentFileId, filename=filename, lastFileId=lastFileId, page=page+1)   
-        logger.error(f"Error: {filename} not found in {files['data']['fileList']}")
-        return {}
+            lastFileId = files['data']['lastFileId']
+            if lastFileId == -1: # 文件列表已经遍历完毕，没有找到
+                logger.error("Error: {} not found under parentFileId={}", filename, parentFileId)
+                return {}
+            # 文件名不在当前页中，按lastFileId继续翻页搜索
+            logger.debug("Fetching more files for parentFileId={} with lastFileId={}", parentFileId, lastFileId)
+            page += 1
+            
+    async def fetch_file(self, parentFileId: Optional[int], filename: str, lastFileId: Optional[int] = None, page: int = 1) -> Dict[str, Any]:
+        """获取文件信息, parentFileId为None(所在目录不存在)时返回空字典"""
+        logger.debug("Calling fetch_file(parentFileID={}, filename={})", parentFileId, filename)
+        if parentFileId is None:
+            return {}
+        f = await self._list_dir_find(parentFileId=parentFileId, filename=filename, type=0, page=page, lastFileId=lastFileId)
+        if f:
+            logger.debug("Found file {} in fileList.", filename)
+        return f
     
     async def download_file(
         self,
@@ -153,13 +258,14 @@ class Driver:
         logger.info(f"Calling download_file(file_path={file_path}, save_path={save_path})")
         dirname = os.path.dirname(file_path)
         _, parentFileId = await self.list_dir(dir=dirname, return_parentFileId=True)
+        downlod_info: Dict[str, Any] = {}
         file = await self.fetch_file(parentFileId=parentFileId, filename=os.path.basename(file_path))
         if file:
-            logger.debug(f"Downloading file {file_path} to {save_path}")
-            downlod_info = await self.api.download_file(fileId=file['fileId'])
+            logger.debug("Downloading file {} to {}", file_path, save_path)
+            downlod_info = await self._call_api(self.api.download_file, fileId=file['fileId'])
             if downlod_info.get('code') == 0:
-                logger.debug(f"Downloading file {file_path} to {save_path} started.")
-                self.utils.download_file(url=downlod_info['data']['downloadUrl'], file_path=save_path, progress_bar=progress_bar)
+                logger.debug("Downloading file {} to {} started.", file_path, save_path)
+                await self.utils.download_file_async(url=downlod_info['data']['downloadUrl'], file_path=save_path, progress_bar=progress_bar)
             else:
                 logger.error(f"Error: {downlod_info.get('message')}")
         else:
@@ -167,6 +273,67 @@ class Driver:
         return downlod_info
         
 
+    async def download_files(
+        self,
+        file_paths: List[str],
+        save_paths: List[str],
+        progress_bar: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """批量下载文件: 同目录只解析一次, 文件信息与下载链接分批并发获取"""
+        logger.info("Calling download_files(count={})", len(file_paths))
+        if len(file_paths) != len(save_paths):
+            raise ValueError("file_paths and save_paths must have the same length")
+        
+        # 1. 每个目录只解析一次parentFileId
+        dirnames = list(dict.fromkeys(os.path.dirname(p) for p in file_paths))
+        resolved = await asyncio.gather(*[self.list_dir(dir=d, return_parentFileId=True) for d in dirnames])
+        parent_ids = {d: parentFileId for d, (_, parentFileId) in zip(dirnames, resolved)}
+        
+        # 2. 并发获取文件信息
+        files = await asyncio.gather(*[
+            self.fetch_file(parentFileId=parent_ids[os.path.dirname(p)], filename=os.path.basename(p))
+            for p in file_paths
+        ])
+        
+        # 3. 并发获取下载链接
+        sem = asyncio.Semaphore(5)
+        async def fetch_download_info(file: Dict[str, Any]) -> Dict[str, Any]:
+            if not file:
+                return {}
+            async with sem:
+                return await self._call_api(self.api.download_file, fileId=file['fileId'])
+        download_infos = await asyncio.gather(*[fetch_download_info(f) for f in files])
+        
+        # 4. 并发下载, 单个文件失败不影响其余文件
+        async def download(file_path: str, save_path: str, url: str) -> None:
+            async with sem:
+                logger.debug("Downloading file {} to {} started.", file_path, save_path)
+                await self.utils.download_file_async(url=url, file_path=save_path, progress_bar=progress_bar)
+        
+        downloads, paths = [], []
+        for file_path, save_path, file, downlod_info in zip(file_paths, save_paths, files, download_infos):
+            if not file:
+                logger.error("Error: {} not found.", file_path)
+            elif downlod_info.get('code') != 0:
+                logger.error("Error: {}", downlod_info.get('message'))
+            else:
+                downloads.append(download(file_path, save_path, downlod_info['data']['downloadUrl']))
+                paths.append(file_path)
+        results = await asyncio.gather(*downloads, return_exceptions=True)
+        for file_path, result in zip(paths, results):
+            if isinstance(result, BaseException):
+                logger.error("Error: downloading {} failed: {}", file_path, result)
+        return download_infos
+
+    async def close(self):
+        """关闭客户端, 先取消仍在进行的后台重新验证"""
+        tasks = list(self._revalidating.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.api.close()
+        await self.utils.aclose()
+
 
 @async_to_sync
 async def main() -> None:
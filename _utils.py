@@ -1,20 +1,76 @@
 import time
+import mmap
+import atexit
 import asyncio
+import hashlib
 from functools import wraps
-from typing import Any, Dict
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Tuple
 
 import httpx
 from tqdm import tqdm
 from rich.console import Console
 from rich.table import Table
-from cachetools import cached, TTLCache
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class FastTTLCache:
+    """
+    带过期时间的LRU缓存
+    
+    基于OrderedDict, 仅在访问时检查条目是否过期, 使用单调时钟不受系统时间调整影响
+    """
+    
+    def __init__(self, maxsize: int = 1000, ttl: float = 600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+    
+    def get(self, key: Any, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        if entry[1] <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return entry[0]
+    
+    def __getitem__(self, key: Any) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+    
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+    
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+    
+    def __len__(self) -> int:
+        return len(self._data)
 
 
 class Utils:
     
+    PAGE_SIZE = 100  # 接口单页文件数
+    _UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+    _TYPE_MAP = {1: "文件夹"}
+    _CATEGORY_MAP = {1: "音频", 2: "视频", 3: "图片"}
+    
     def __init__(self):
         self.console = Console()
-        self.files_cache = TTLCache(maxsize=1000, ttl=600)  # 10分钟
+        self._dl_client: Optional[httpx.AsyncClient] = None  # 下载客户端, 见_download_client()
+        self.files_cache = FastTTLCache(maxsize=1000, ttl=600)  # 10分钟
+        self.index_cache = FastTTLCache(maxsize=1000, ttl=600)  # 与files_cache同键的 (type, filename) 索引
+        self.fresh_cache = FastTTLCache(maxsize=1000, ttl=60)  # 新鲜期内的缓存页无需重新验证
+        self.path_cache = FastTTLCache(maxsize=4096, ttl=600)  # 目录路径 -> parentFileId
     
     def format_file_size(self, size_bytes: int, decimal_places: int = 1) -> str:
         """
@@ -27,27 +83,14 @@ class Utils:
         Returns:
             格式化后的文件大小字符串，如 "1.2 KB", "1.23 MB"
         """
-        if size_bytes == 0:
-            return "0 B"
-        
-        # 定义单位
-        units = ['B', 'KB', 'MB', 'GB', 'TB', 'PB']
-        unit_index = 0
-        
-        # 计算合适的单位
-        size = float(size_bytes)
-        while size >= 1024.0 and unit_index < len(units) - 1:
-            size /= 1024.0
-            unit_index += 1
+        if size_bytes < 1024:  # B单位，不显示小数
+            return f"{int(size_bytes)} B"
         
-        # 格式化显示
-        if unit_index == 0:  # B单位，不显示小数
-            return f"{int(size)} {units[unit_index]}"
-        else:
-            # 确保小数位数不超过2位
-            decimal_places = min(decimal_places, 2)
-            format_str = f"{{:.{decimal_places}f}} {units[unit_index]}"
-            return format_str.format(size)
+        # 按二进制位数直接确定单位
+        unit_index = min((int(size_bytes).bit_length() - 1) // 10, len(self._UNITS) - 1)
+        size = size_bytes / (1 << (10 * unit_index))
+        # 确保小数位数不超过2位
+        return f"{size:.{min(decimal_places, 2)}f} {self._UNITS[unit_index]}"
     
     def print_file_list(self, files):
         """
@@ -56,21 +99,27 @@ class Utils:
         Args:
             files: 文件列表
         """
-        table = Table(title="文件列表")
+        file_type, file_size = self.print_file_type, self.format_file_size
+        rows = [
+            (file_type(file), file['filename'], file_size(file.get('size', 0)), file.get('updateAt', ''))
+            for file in files
+        ]
+        # 文件过多时分块渲染, 边渲染边输出
+        chunk_size = len(rows) if len(rows) <= 10000 else 1000
+        for start in range(0, max(len(rows), 1), chunk_size or 1):
+            table = self._file_table(title="文件列表" if start == 0 else None)
+            for row in rows[start:start + chunk_size]:
+                table.add_row(*row)
+            self.console.print(table)
+    
+    def _file_table(self, title: Optional[str] = "文件列表") -> Table:
+        """创建文件列表表格"""
+        table = Table(title=title)
         table.add_column("类型", style="cyan", width=10)
         table.add_column("名称", style="magenta")
         table.add_column("大小", style="green", width=15)
         table.add_column("修改时间", style="yellow", width=20)
-    
-        for file in files:
-            type = self.print_file_type(file)
-            name = file['filename']
-            size = self.format_file_size(file.get('size', 0))
-            modified = file.get('updateAt', '')
-            
-            table.add_row(type, name, size, modified)
-
-        self.console.print(table)
+        return table
         
     def print_file_type(self, file: Dict[str, Any]) -> str:
         """
@@ -82,19 +131,9 @@ class Utils:
         Returns:
             格式化后的文件类型字符串，如 "文件夹", "音频", "视频", "图片", "未知"
         """
-        if file['type'] == 1:
-            return "文件夹"
-        else:
-            if file['category'] == 1:
-                return "音频"
-            elif file['category'] == 2:
-                return "视频"
-            elif file['category'] == 3:
-                return "图片"
-            else:
-                return "未知"
+        return self._TYPE_MAP.get(file['type']) or self._CATEGORY_MAP.get(file.get('category'), "未知")
             
-    def computing_page(self, page: int, limit: int) -> list:
+    def computing_page(self, page: int, limit: int) -> range:
         """
         计算分页信息
         
@@ -103,13 +142,11 @@ class Utils:
             limit: 每页显示数量
             
         Returns:
-            包含所有分页的列表，如 [1, 2, 3]
+            覆盖该页数据的所有接口分页(每页PAGE_SIZE条), 如 range(1, 4)
         """
-        pages = []
-        for i in range(page * limit - limit, page * limit, 100):
-            page_i = i // 100 + 1
-            pages.append(page_i)
-        return pages
+        first = (page - 1) * limit // self.PAGE_SIZE + 1
+        last = (page * limit - 1) // self.PAGE_SIZE + 1
+        return range(first, last + 1)
     
     def merge_files(self, files_list: list[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -121,53 +158,95 @@ class Utils:
         Returns:
             合并后的文件列表响应json数据
         """
-        merged_files = {
-            'code': 0,
-            'message': 'ok',
-            'data': {'lastFileId': 0,'fileList': []},
-            'x-traceID': ''
-        }
+        if not files_list:
+            return {'code': 0, 'message': 'ok', 'data': {'lastFileId': 0, 'fileList': []}, 'x-traceID': ''}
+        file_list = []
         for files in files_list:
-            merged_files['code'] = files['code']
-            merged_files['message'] = files['message']
-            merged_files['data']['lastFileId'] = files['data']['lastFileId']
-            merged_files['data']['fileList'] += files['data']['fileList']
-            merged_files['x-traceID'] = files['x-traceID']
-        return merged_files
+            file_list.extend(files['data']['fileList'])
+        # 元数据以最后一页为准
+        last = files_list[-1]
+        return {
+            'code': last['code'],
+            'message': last['message'],
+            'data': {'lastFileId': last['data']['lastFileId'], 'fileList': file_list},
+            'x-traceID': last['x-traceID']
+        }
         
             
-    def cache_files(self, files: Dict[str, Any], parentFileId: int, page: int = 1):
+    def build_index(self, files: Dict[str, Any]) -> Dict[Tuple[int, str], Dict[str, Any]]:
         """
-        缓存文件列表
+        构建文件列表索引
+        
+        Args:
+            files: 文件列表响应json数据
+            
+        Returns:
+            (type, filename) 到文件信息的映射
+        """
+        return {(f['type'], f['filename']): f for f in files['data']['fileList']}
+    
+    def cache_files(self, files: Dict[str, Any], parentFileId: int, page: int = 1) -> Dict[Tuple[int, str], Dict[str, Any]]:
+        """
+        缓存文件列表及其索引
         
         Args:
             files: 文件列表
             parentFileId: 父目录ID
             page: 页码
+            
+        Returns:
+            该页的 (type, filename) 索引
         """
         cache_key = f"files:{parentFileId}:{page}"
-        self.files_cache[cache_key] = {
-            'files': files,
-            'timestamp': time.time()
-        }
+        index = self.build_index(files)
+        self.files_cache[cache_key] = files
+        self.index_cache[cache_key] = index
+        self.fresh_cache[cache_key] = True
+        return index
         
     def get_cached_files(self, parentFileId: int, page: int = 1) -> Dict[str, Any]:
         """获取缓存的文件列表"""
+        return self.files_cache.get(f"files:{parentFileId}:{page}") or {}
+    
+    def is_fresh(self, parentFileId: int, page: int = 1) -> bool:
+        """缓存页是否仍在新鲜期内"""
+        return f"files:{parentFileId}:{page}" in self.fresh_cache
+    
+    def lookup_cached(self, parentFileId: int, page: int, filename: str, type: int) -> Dict[str, Any]:
+        """
+        在缓存页的索引中查找文件
+        
+        Args:
+            parentFileId: 父目录ID
+            page: 页码
+            filename: 文件名
+            type: 文件类型, 0为文件, 1为文件夹
+            
+        Returns:
+            文件信息, 未缓存或未找到时返回空字典
+        """
         cache_key = f"files:{parentFileId}:{page}"
-        if self.files_cache.get(cache_key):
-            return self.files_cache[cache_key]['files']
-        else:
-            return {}
+        index = self.index_cache.get(cache_key)
+        if index is None: # 索引被单独淘汰时按缓存页重建
+            files = self.files_cache.get(cache_key)
+            if not files:
+                return {}
+            index = self.index_cache[cache_key] = self.build_index(files)
+        return index.get((type, filename), {})
     
-    def cache_limit(self, maxsize=1000, ttl=300):
+    def cache_limit(self, maxsize=1000, ttl=300, fresh_ttl=60):
         """
         设置缓存文件大小限制
         
         Args:
             maxsize: 缓存文件大小限制
             ttl: 缓存过期时间
+            fresh_ttl: 缓存新鲜期, 超过后返回缓存的同时在后台重新验证
         """
-        self.files_cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.files_cache = FastTTLCache(maxsize=maxsize, ttl=ttl)
+        self.index_cache = FastTTLCache(maxsize=maxsize, ttl=ttl)
+        self.fresh_cache = FastTTLCache(maxsize=maxsize, ttl=min(fresh_ttl, ttl))
+        self.path_cache = FastTTLCache(maxsize=self.path_cache.maxsize, ttl=ttl)
         
     def computing_time(self, start_time: float) -> str:
         """
@@ -183,6 +262,72 @@ class Utils:
         elapsed_time = end_time - start_time
         return f"{elapsed_time:.3f} s"
     
+    async def slice_md5(self, slice: bytes) -> str:
+        """
+        在线程池中计算分片MD5(sliceMD5)
+        
+        Args:
+            slice: 分片数据
+            
+        Returns:
+            十六进制MD5字符串
+        """
+        return await asyncio.to_thread(_hash_slice, slice)
+    
+    async def file_md5(self, file_path: str) -> str:
+        """
+        在线程池中计算文件MD5(etag)
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            十六进制MD5字符串
+        """
+        return await asyncio.to_thread(_hash_file, file_path)
+    
+    async def download_file_async(self, url: str, file_path: str, progress_bar: bool = True, chunk_size: int = 1 << 20) -> None:
+        """
+        异步下载文件, 不阻塞事件循环
+        
+        Args:
+            url: 文件URL
+            file_path: 保存路径
+            progress_bar: 是否显示进度条
+            chunk_size: 读取块大小, 默认1MB
+        """
+        async with self._download_client().stream("GET", url) as response:
+            response.raise_for_status()
+            total_size = int(response.headers.get("Content-Length", 0))
+            if progress_bar:
+                progress = tqdm(total=total_size, unit="iB", unit_scale=True)
+            file = await asyncio.to_thread(open, file_path, "wb")
+            try:
+                async for data in response.aiter_bytes(chunk_size=chunk_size):
+                    await asyncio.to_thread(file.write, data)
+                    if progress_bar:
+                        progress.update(len(data))
+            finally:
+                file.close()
+                if progress_bar:
+                    progress.close()
+    
+    def _download_client(self) -> httpx.AsyncClient:
+        """获取复用的下载客户端, 首次使用时创建"""
+        if self._dl_client is None:
+            self._dl_client = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=40),
+                timeout=None,
+            )
+        return self._dl_client
+    
+    async def aclose(self) -> None:
+        """关闭下载客户端"""
+        if self._dl_client is not None:
+            await self._dl_client.aclose()
+            self._dl_client = None
+    
     def download_file(self, url: str, file_path: str, progress_bar: bool = True) -> None:
         """
         下载文件
@@ -206,9 +351,65 @@ class Utils:
                 progress.close()
 
 
+def _hash_slice(buf: bytes) -> str:
+    """计算分片MD5"""
+    h = hashlib.md5()
+    h.update(memoryview(buf))
+    return h.hexdigest()
+
+
+def _hash_file(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """通过mmap分块计算整个文件的MD5"""
+    h = hashlib.md5()
+    with open(file_path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # 空文件无法mmap
+            return h.hexdigest()
+        with mm, memoryview(mm) as mv:
+            for i in range(0, len(mv), chunk_size):
+                h.update(mv[i:i + chunk_size])
+    return h.hexdigest()
+
+
+async def gather_tasks(aws: Iterable[Awaitable[Any]]) -> List[Any]:
+    """并发执行并按顺序返回结果, 任一失败时取消其余任务并抛出原始异常
+
+    Python 3.11+使用TaskGroup, 其ExceptionGroup会被拆开, 与gather的异常类型保持一致
+    """
+    if hasattr(asyncio, "TaskGroup"):
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tasks = [tg.create_task(aw) for aw in aws]
+        except BaseExceptionGroup as eg:
+            raise eg.exceptions[0]
+        return [task.result() for task in tasks]
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+_runner: Any = None  # 共享的asyncio.Runner(Python 3.11+)或事件循环
+
+
+def _run(coro: Awaitable[Any]) -> Any:
+    """在共享事件循环中运行协程, 避免每次调用都新建/销毁事件循环"""
+    global _runner
+    if _runner is None:
+        _runner = asyncio.Runner() if hasattr(asyncio, "Runner") else asyncio.new_event_loop()
+        atexit.register(_runner.close)
+    if isinstance(_runner, asyncio.AbstractEventLoop):
+        return _runner.run_until_complete(coro)
+    return _runner.run(coro)
+
+
 def async_to_sync(func):
-    """装饰器: 将异步方法转换为同步方法, 自动处理asyncio.run()"""
+    """装饰器: 将异步方法转换为同步方法, 多次调用复用同一事件循环"""
     @wraps(func)
     def wrapper(*args, **kwargs):
-        return asyncio.run(func(*args, **kwargs))
+        return _run(func(*args, **kwargs))
     return wrapper
\ No newline at end of file
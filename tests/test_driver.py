@@ -0,0 +1,235 @@
+import os
+import sys
+import asyncio
+import functools
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _main import Driver
+from _api import API, _multipart_stream
+from _utils import Utils
+
+
+DOWNLOAD_URL = "https://download.example.com/a.txt"
+CONTENT = b"hello 123driver"
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/api/v2/file/list":
+        return httpx.Response(200, json={
+            "code": 0,
+            "message": "ok",
+            "data": {
+                "lastFileId": -1,
+                "fileList": [{"fileId": 11, "filename": "a.txt", "type": 0, "size": len(CONTENT), "category": 0}],
+            },
+            "x-traceID": "",
+        })
+    if request.url.path == "/api/v1/file/download_info":
+        assert request.url.params["fileId"] == "11"
+        return httpx.Response(200, json={"code": 0, "message": "ok", "data": {"downloadUrl": DOWNLOAD_URL}})
+    if str(request.url) == DOWNLOAD_URL:
+        return httpx.Response(200, content=CONTENT)
+    return httpx.Response(404)
+
+
+@pytest.fixture
+def run():
+    """测试内共享同一事件循环, Driver的创建、调用与关闭都在其中进行"""
+    with asyncio.Runner() as runner:
+        yield runner.run
+
+
+@pytest.fixture
+def sent():
+    """driver发出的请求"""
+    return []
+
+
+@pytest.fixture
+def driver(request, run, sent, tmp_path, monkeypatch):
+    """使用MockTransport的Driver, handler通过parametrize(indirect=True)传入"""
+    handler = getattr(request, "param", _handler)
+
+    def record(req: httpx.Request) -> httpx.Response:
+        sent.append(req)
+        return handler(req)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(httpx, "AsyncClient", functools.partial(httpx.AsyncClient, transport=httpx.MockTransport(record)))
+    driver = Driver(client_id="id", client_secret="secret")
+    yield driver
+    run(driver.close())
+
+
+def test_download_file(driver, run, tmp_path):
+    save_path = tmp_path / "a.txt"
+    info = run(driver.download_file(file_path="/a.txt", save_path=str(save_path), progress_bar=False))
+    assert info["data"]["downloadUrl"] == DOWNLOAD_URL
+    assert save_path.read_bytes() == CONTENT
+
+
+def _paged_handler(request: httpx.Request) -> httpx.Response:
+    # 250个文件, 每页最多100条, lastFileId为本页最后一个fileId
+    limit = int(request.url.params["limit"])
+    assert limit == 100
+    start = int(request.url.params.get("lastFileId", 0))
+    ids = list(range(start + 1, min(start + limit, 250) + 1))
+    return httpx.Response(200, json={
+        "code": 0,
+        "message": "ok",
+        "data": {
+            "lastFileId": ids[-1] if ids[-1] < 250 else -1,
+            "fileList": [{"fileId": i, "filename": f"{i}.txt", "type": 0, "size": 0, "category": 0} for i in ids],
+        },
+        "x-traceID": "",
+    })
+
+
+@pytest.mark.parametrize("driver", [_paged_handler], indirect=True)
+def test_list_dir_limit(driver, run):
+    first = run(driver.list_dir("/", limit=200))
+    second = run(driver.list_dir("/", page=2, limit=50))
+    last = run(driver.list_dir("/", page=2, limit=200))
+    assert [f["fileId"] for f in first] == list(range(1, 201))
+    assert [f["fileId"] for f in second] == list(range(51, 101))
+    assert [f["fileId"] for f in last] == list(range(201, 251))
+
+
+def test_coalesce_leader_cancelled(run):
+    async def main():
+        api = API(client_id="id", client_secret="secret")
+        release = asyncio.Event()
+
+        async def request():
+            await release.wait()
+            return {"code": 0}
+
+        try:
+            leader = asyncio.create_task(api._coalesce(("k",), request))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(api._coalesce(("k",), request))
+            await asyncio.sleep(0)
+            leader.cancel()
+            await asyncio.sleep(0)
+            release.set()
+            return await follower, leader.cancelled(), api._inflight
+        finally:
+            await api.close()
+
+    result, cancelled, inflight = run(main())
+    assert result == {"code": 0}
+    assert cancelled
+    assert not inflight
+
+
+def test_list_dir_missing_segment(driver, run):
+    files, parentFileId = run(driver.list_dir("/nonexistent/sub", return_parentFileId=True))
+    assert files == []
+    assert parentFileId is None
+    assert len(driver.utils.path_cache) == 0
+
+
+def _error_handler(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(500, headers={"Retry-After": "0"})
+
+
+@pytest.mark.parametrize("driver", [_error_handler], indirect=True)
+def test_post_not_retried_on_500(driver, run, sent):
+    run(driver.api._send(driver.api._post, "api/test", json={}))
+    run(driver.api._send(driver.api._get, "api/test"))
+    assert [r.method for r in sent] == ["POST"] + ["GET"] * 5
+
+
+def test_multipart_stream_escaping(run):
+    filename = 'a"b\\c\nd\x1be.txt'
+    fields = {'na"me': "v"}
+
+    async def chunks():
+        yield b"data"
+
+    async def main():
+        content_type, length, body = _multipart_stream(fields, "fi\\le", filename, chunks(), size=4)
+        return content_type, length, b"".join([chunk async for chunk in body])
+
+    content_type, length, body = run(main())
+    boundary = content_type.split("boundary=")[1]
+    expected = httpx.Request("POST", "https://example.com", data=fields, files={"fi\\le": (filename, b"data", "application/octet-stream")})
+    expected_body = expected.read().replace(expected.headers["Content-Type"].split("boundary=")[1].encode(), boundary.encode())
+    assert body == expected_body
+    assert length == len(body)
+
+
+def _forbidden_handler(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(403)
+
+
+@pytest.mark.parametrize("driver", [_forbidden_handler], indirect=True)
+@pytest.mark.parametrize("dir", ["/", "/x"])
+def test_list_dir_http_error(driver, run, dir):
+    with pytest.raises(httpx.HTTPStatusError):
+        run(driver.list_dir(dir))
+
+
+def _batch_handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/api/v2/file/list":
+        return httpx.Response(200, json={
+            "code": 0,
+            "message": "ok",
+            "data": {
+                "lastFileId": -1,
+                "fileList": [
+                    {"fileId": 11, "filename": "a.txt", "type": 0, "size": len(CONTENT), "category": 0},
+                    {"fileId": 12, "filename": "b.txt", "type": 0, "size": len(CONTENT), "category": 0},
+                ],
+            },
+            "x-traceID": "",
+        })
+    if request.url.path == "/api/v1/file/download_info":
+        url = f"https://download.example.com/{request.url.params['fileId']}"
+        return httpx.Response(200, json={"code": 0, "message": "ok", "data": {"downloadUrl": url}})
+    if str(request.url) == "https://download.example.com/11":
+        return httpx.Response(200, content=CONTENT)
+    return httpx.Response(404)
+
+
+@pytest.mark.parametrize("driver", [_batch_handler], indirect=True)
+def test_download_files_partial_failure(driver, run, tmp_path):
+    save_paths = [str(tmp_path / "a.txt"), str(tmp_path / "b.txt")]
+    infos = run(driver.download_files(["/a.txt", "/b.txt"], save_paths, progress_bar=False))
+    assert [info["code"] for info in infos] == [0, 0]
+    assert (tmp_path / "a.txt").read_bytes() == CONTENT
+
+
+def test_close_cancels_revalidation(driver, run):
+    driver.utils.cache_limit(fresh_ttl=0)
+
+    async def main():
+        await driver.list_dir("/")
+        await driver.list_dir("/")
+        tasks = list(driver._revalidating.values())
+        await driver.close()
+        return tasks
+
+    tasks = run(main())
+    assert tasks and all(task.cancelled() for task in tasks)
+    assert not driver._revalidating
+
+
+@pytest.mark.parametrize("driver", [_paged_handler], indirect=True)
+def test_fetch_file_beyond_first_page(driver, run):
+    assert run(driver.fetch_file(0, "201.txt"))["fileId"] == 201
+    assert run(driver.fetch_file(0, "missing.txt")) == {}
+
+
+def test_computing_page():
+    utils = Utils()
+    assert utils.computing_page(page=4, limit=30) == range(1, 3)
+    for page in range(1, 20):
+        for limit in range(1, 350):
+            items = range((page - 1) * limit, page * limit)
+            expected = sorted({i // utils.PAGE_SIZE + 1 for i in items})
+            assert list(utils.computing_page(page=page, limit=limit)) == expected, (page, limit)